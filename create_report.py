@@ -5,6 +5,8 @@ import shutil
 import glob
 import unicodedata
 import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from colorama import init, Fore, Style
 
 try:
@@ -21,6 +23,9 @@ PLACA_PATTERN = re.compile(r'PLACA:\s*([A-Z0-9\-]{6,7})', re.IGNORECASE)
 PLACA_QUALQUER_PATTERN = re.compile(r'(?<![A-Z0-9\-])([A-Z0-9\-]{6,7})(?![A-Z0-9\-])', re.IGNORECASE)
 DEST_PATTERN = re.compile(r'([A-Z0-9\-]{6,7})')
 
+# Máximo de etapas de I/O simultâneas: cópia da escala + gravação dos dois relatórios
+MAX_WORKERS_IO = 3
+
 def remover_acentos(texto):
     """Remove acentos de um texto"""
     nfd = unicodedata.normalize('NFD', texto)
@@ -116,19 +121,22 @@ def _extrair_secao_por_linha(conteudo, cabecalhos_secao, cabecalhos_proxima_seca
     return conteudo[inicio_idx:fim_idx]
 
 
-def extrair_motoristas_atraso(arquivo_excel, coluna_motorista, coluna_apresenta, coluna_escala):
+def extrair_motoristas_atraso(arquivo_excel, coluna_motorista, coluna_apresenta, coluna_escala, wb=None):
     """
     Extrai motoristas em atraso que possuem ANOTAÇÕES (comentários do Excel) na coluna APRESENTA
     E onde o horário em APRESENTA é MAIOR que o horário em ESCALA
     Retorna string formatada: MOTORISTA - ESCALA: HH:MM - ANOTAÇÃO
+    Se wb for informado, usa o workbook já carregado (e não o fecha).
     """
     motoristas_atraso = ""
     
     if not OPENPYXL_AVAILABLE:
         return motoristas_atraso
     
+    fechar_wb = wb is None
     try:
-        wb = load_workbook(arquivo_excel)
+        if fechar_wb:
+            wb = load_workbook(arquivo_excel)
         ws = wb.active
         
         # Encontrar índices das colunas
@@ -146,7 +154,8 @@ def extrair_motoristas_atraso(arquivo_excel, coluna_motorista, coluna_apresenta,
                     col_escala_idx = cell.column
         
         if not col_apresenta_idx or not col_motorista_idx or not col_escala_idx:
-            wb.close()
+            if fechar_wb:
+                wb.close()
             return motoristas_atraso
         
         # Iterar pelas linhas procurando por comentários em APRESENTA
@@ -215,7 +224,8 @@ def extrair_motoristas_atraso(arquivo_excel, coluna_motorista, coluna_apresenta,
                         
                         motoristas_atraso += f"{motorista_str} - ESCALA: {escala_str} - {anotacao_str}\n"
         
-        wb.close()
+        if fechar_wb:
+            wb.close()
         
     except Exception as e:
         print(f"{Fore.YELLOW}⚠ Erro ao extrair motoristas em atraso: {e}{Style.RESET_ALL}")
@@ -364,9 +374,10 @@ def encontrar_arquivo_escala():
         return arquivos[0]
     return None
 
-def obter_linhas_com_valores_reais(arquivo_excel, nome_coluna_frota):
+def obter_linhas_com_valores_reais(arquivo_excel, nome_coluna_frota, wb=None):
     """
     Retorna índices das linhas que têm valores reais (não fórmulas) na coluna FROTA
+    Se wb for informado, usa o workbook já carregado (e não o fecha).
     """
     linhas_reais = set()
     
@@ -374,8 +385,10 @@ def obter_linhas_com_valores_reais(arquivo_excel, nome_coluna_frota):
         # Se openpyxl não está disponível, retorna todas as linhas (fallback)
         return None
     
+    fechar_wb = wb is None
     try:
-        wb = load_workbook(arquivo_excel)
+        if fechar_wb:
+            wb = load_workbook(arquivo_excel)
         ws = wb.active
         
         # Encontrar o índice da coluna FROTA
@@ -387,7 +400,8 @@ def obter_linhas_com_valores_reais(arquivo_excel, nome_coluna_frota):
         
         if coluna_frota_idx is None:
             print(f"{Fore.YELLOW}⚠ Coluna {nome_coluna_frota} não encontrada no header{Style.RESET_ALL}")
-            wb.close()
+            if fechar_wb:
+                wb.close()
             return None
         
         # Iterar pelas linhas e verificar se a célula tem fórmula
@@ -397,47 +411,110 @@ def obter_linhas_com_valores_reais(arquivo_excel, nome_coluna_frota):
             if cell.value and not str(cell.value).startswith('='):
                 linhas_reais.add(row_num)
         
-        wb.close()
+        if fechar_wb:
+            wb.close()
         return linhas_reais if linhas_reais else None
         
     except Exception as e:
         print(f"{Fore.YELLOW}⚠ Erro ao detectar fórmulas: {e}{Style.RESET_ALL}")
         return None
 
+def ler_cole_aqui(caminho='2.ULTIMO-REPORT/COLE_AQUI.txt'):
+    """
+    Lê o COLE_AQUI.txt e extrai as seções PAVÃO e PENDÊNCIAS.
+    Retorna (pavao_content, pendencias_content) ou None se o arquivo não existir.
+    """
+    pavao_content = ""
+    pendencias_content = ""
+
+    try:
+        with open(caminho, 'r', encoding='utf-8') as file:
+            conteudo = file.read()
+    except FileNotFoundError:
+        return None
+
+    # Extrair conteúdo de PAVÃO: (com ou sem acento) - somente cabeçalho em linha isolada
+    pavao_raw = _extrair_secao_por_linha(
+        conteudo,
+        ['PAVÃO:', 'PAVAO:'],
+        ['PENDÊNCIAS:', 'PENDENCIAS:']
+    )
+    if pavao_raw:
+        pavao_content = pavao_raw.strip().upper()
+
+    # Extrair conteúdo de PENDÊNCIAS: (com ou sem acento)
+    pendencias_raw = _extrair_secao_por_linha(
+        conteudo,
+        ['PENDÊNCIAS:', 'PENDENCIAS:'],
+        ['TROCA DE CAVALO:']
+    )
+    if pendencias_raw:
+        pendencias_content = pendencias_raw.strip().upper()
+
+    return pavao_content, pendencias_content
+
+def escrever_arquivo_atomico(caminho, conteudo):
+    """
+    Grava o conteúdo em um arquivo temporário na mesma pasta e depois renomeia
+    para o destino, evitando relatórios pela metade se a gravação falhar.
+    """
+    pasta = os.path.dirname(caminho) or '.'
+    # Modo 'x' cria o arquivo com as permissões normais (umask), ao contrário do mkstemp (0600);
+    # sufixo .tmp para que sobras de uma execução interrompida não pareçam relatórios
+    caminho_temp = os.path.join(pasta, f'.{os.path.basename(caminho)}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(caminho_temp, 'x', encoding='utf-8') as file:
+            file.write(conteudo)
+            # Garantir que o conteúdo está no disco antes de substituir o destino
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(caminho_temp, caminho)
+    except BaseException:
+        # BaseException para limpar o temporário também em Ctrl+C
+        try:
+            os.remove(caminho_temp)
+        except OSError:
+            pass
+        raise
+
+def carregar_workbook(arquivo_excel):
+    """
+    Carrega a planilha com openpyxl uma única vez para ser compartilhada entre as extrações.
+    Retorna None se o openpyxl não estiver disponível ou se houver erro.
+    """
+    if not OPENPYXL_AVAILABLE:
+        return None
+    try:
+        return load_workbook(arquivo_excel)
+    except Exception as e:
+        print(f"{Fore.YELLOW}⚠ Erro ao carregar planilha com openpyxl: {e}{Style.RESET_ALL}")
+        return None
+
+def _aguardar_copia_escala(future_copia_escala):
+    """Aguarda a cópia da escala para o histórico e informa o resultado"""
+    if future_copia_escala is None:
+        return
+    try:
+        future_copia_escala.result()
+        print(f"{Fore.GREEN}✓ Escala copiada para histórico{Style.RESET_ALL}")
+    except Exception as e:
+        print(f"{Fore.YELLOW}[AVISO] Aviso ao copiar escala: {e}{Style.RESET_ALL}")
+
 # Function to create the report
 def create_report(plano_do_dia, responsavel, aguardando_mdf, aguardando_faturamento):
+    # Etapas de I/O independentes (cópia da escala, leitura do COLE_AQUI e gravação
+    # dos relatórios) rodam em paralelo; o pool espera todas ao sair
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS_IO) as executor:
+        _gerar_relatorio(executor, plano_do_dia, responsavel, aguardando_mdf, aguardando_faturamento)
+
+def _gerar_relatorio(executor, plano_do_dia, responsavel, aguardando_mdf, aguardando_faturamento):
+    data_sem_ano = datetime.now().strftime('%d-%m')
+    future_copia_escala = None
+
     # Read the Excel file
     try:
-        print(f"{Fore.YELLOW}⏳ Lendo arquivo COLE_AQUI.txt...{Style.RESET_ALL}")
-        pavao_content = ""
-        pendencias_content = ""
-        
-        # Tentar ler o arquivo COLE_AQUI.txt
-        try:
-            with open('2.ULTIMO-REPORT/COLE_AQUI.txt', 'r', encoding='utf-8') as file:
-                conteudo = file.read()
-                
-                # Extrair conteúdo de PAVÃO: (com ou sem acento) - somente cabeçalho em linha isolada
-                pavao_raw = _extrair_secao_por_linha(
-                    conteudo,
-                    ['PAVÃO:', 'PAVAO:'],
-                    ['PENDÊNCIAS:', 'PENDENCIAS:']
-                )
-                if pavao_raw:
-                    pavao_content = pavao_raw.strip().upper()
-                
-                # Extrair conteúdo de PENDÊNCIAS: (com ou sem acento)
-                pendencias_raw = _extrair_secao_por_linha(
-                    conteudo,
-                    ['PENDÊNCIAS:', 'PENDENCIAS:'],
-                    ['TROCA DE CAVALO:']
-                )
-                if pendencias_raw:
-                    pendencias_content = pendencias_raw.strip().upper()
-                
-                print(f"{Fore.CYAN}✓ Arquivo COLE_AQUI.txt lido com sucesso{Style.RESET_ALL}")
-        except FileNotFoundError:
-            print(f"{Fore.YELLOW}⚠ Arquivo COLE_AQUI.txt não encontrado, usando campos vazios{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}⏳ Iniciando leitura do COLE_AQUI.txt em paralelo...{Style.RESET_ALL}")
+        future_cole_aqui = executor.submit(ler_cole_aqui)
         
         print(f"{Fore.YELLOW}⏳ Procurando planilha de escalas...{Style.RESET_ALL}")
         arquivo_escala = encontrar_arquivo_escala()
@@ -447,12 +524,27 @@ def create_report(plano_do_dia, responsavel, aguardando_mdf, aguardando_faturame
             return
         
         print(f"{Fore.CYAN}📊 Encontrado: {os.path.basename(arquivo_escala)}{Style.RESET_ALL}")
+        
+        # Copiar escala para histórico (sobrescreve se já existe no dia) enquanto a planilha é lida
+        nome_arquivo_escala = os.path.basename(arquivo_escala)
+        nome_sem_extensao = os.path.splitext(nome_arquivo_escala)[0]
+        arquivo_escala_destino = f'4.HISTORICO-ESCALA/{nome_sem_extensao} {data_sem_ano}.xlsx'
+        future_copia_escala = executor.submit(shutil.copy2, arquivo_escala, arquivo_escala_destino)
+        
         print(f"{Fore.YELLOW}⏳ Lendo planilha...{Style.RESET_ALL}")
         df = pd.read_excel(arquivo_escala)
         
         # Debug: mostrar nomes das colunas
         print(f"{Fore.CYAN}📋 Colunas encontradas: {list(df.columns)}{Style.RESET_ALL}")
         
+        resultado_cole_aqui = future_cole_aqui.result()
+        if resultado_cole_aqui is None:
+            pavao_content, pendencias_content = "", ""
+            print(f"{Fore.YELLOW}⚠ Arquivo COLE_AQUI.txt não encontrado, usando campos vazios{Style.RESET_ALL}")
+        else:
+            pavao_content, pendencias_content = resultado_cole_aqui
+            print(f"{Fore.CYAN}✓ Arquivo COLE_AQUI.txt lido com sucesso{Style.RESET_ALL}")
+        
         # Process the data as needed
         num_motoristas = len(df)
         
@@ -480,12 +572,22 @@ def create_report(plano_do_dia, responsavel, aguardando_mdf, aguardando_faturame
         
         print(f"{Fore.CYAN}📋 Colunas de viagem: {len(colunas_viagem)}{Style.RESET_ALL}")
         
-        # Obter linhas com valores reais (não fórmulas) na coluna FROTA
+        # Carregar o workbook uma única vez para FROTA e anotações de APRESENTA.
+        # Se não carregou (sem openpyxl ou erro), usa os valores padrão sem tentar de novo
         linhas_frota_reais = None
-        if coluna_frota:
-            linhas_frota_reais = obter_linhas_com_valores_reais(arquivo_escala, coluna_frota)
-            if linhas_frota_reais:
-                print(f"{Fore.CYAN}📦 Encontradas {len(linhas_frota_reais)} linhas com valores reais em FROTA{Style.RESET_ALL}")
+        wb = carregar_workbook(arquivo_escala)
+        if wb is not None:
+            try:
+                # Obter linhas com valores reais (não fórmulas) na coluna FROTA
+                if coluna_frota:
+                    linhas_frota_reais = obter_linhas_com_valores_reais(arquivo_escala, coluna_frota, wb=wb)
+                    if linhas_frota_reais:
+                        print(f"{Fore.CYAN}📦 Encontradas {len(linhas_frota_reais)} linhas com valores reais em FROTA{Style.RESET_ALL}")
+                
+                # Extrair motoristas em atraso (com anotações do Excel na coluna APRESENTA)
+                motoristas_atraso_content = extrair_motoristas_atraso(arquivo_escala, coluna_motorista, 'APRESENTA', 'ESCALA', wb=wb)
+            finally:
+                wb.close()
         
         if colunas_viagem and 'ESCALA' in df.columns:
             print(f"{Fore.YELLOW}⏳ Analisando viagens...{Style.RESET_ALL}")
@@ -548,13 +650,13 @@ def create_report(plano_do_dia, responsavel, aguardando_mdf, aguardando_faturame
         print(f"{Fore.CYAN}📦 Enviados encontrados: {str(enviados).zfill(2)}{Style.RESET_ALL}")
     except Exception as e:
         print(f"{Fore.RED}✗ Erro ao ler planilha: {e}{Style.RESET_ALL}")
+        _aguardar_copia_escala(future_copia_escala)
         return
 
     # Prepare the report content
     data_atual = datetime.now().strftime('%d/%m')
     
-    # Extrair motoristas em atraso (com anotações do Excel na coluna APRESENTA)
-    motoristas_atraso_content = extrair_motoristas_atraso(arquivo_escala, coluna_motorista, 'APRESENTA', 'ESCALA')
+    # Motoristas em atraso (anotações do Excel na coluna APRESENTA)
     if motoristas_atraso_content:
         print(f"{Fore.CYAN}ℹ Motoristas em atraso encontrados com anotações:{Style.RESET_ALL}")
         for linha in motoristas_atraso_content.strip().split('\n'):
@@ -617,27 +719,28 @@ MOTORISTA EM ATRASO:
 
     # Write to a new report file
     timestamp = datetime.now().strftime('%d-%m-%Y %H-%M-%S')
-    data_sem_ano = datetime.now().strftime('%d-%m')
     arquivo_raiz = 'ULTIMO_RELATORIO.txt'
     arquivo_historico = f'3.HISTORICO-REPORT/REPORT {responsavel} {timestamp}.txt'
     
-    # Salvar na raiz
-    with open(arquivo_raiz, 'w', encoding='utf-8') as file:
-        file.write(report_content)
-    
-    # Salvar cópia no histórico
-    with open(arquivo_historico, 'w', encoding='utf-8') as file:
-        file.write(report_content)
-    
-    # Copiar escala para histórico (sobrescreve se já existe no dia)
-    nome_arquivo_escala = os.path.basename(arquivo_escala)
-    nome_sem_extensao = os.path.splitext(nome_arquivo_escala)[0]
-    arquivo_escala_destino = f'4.HISTORICO-ESCALA/{nome_sem_extensao} {data_sem_ano}.xlsx'
+    # Salvar na raiz e cópia no histórico em paralelo (gravação atômica)
+    futures_gravacao = [
+        (arquivo, executor.submit(escrever_arquivo_atomico, arquivo, report_content))
+        for arquivo in (arquivo_raiz, arquivo_historico)
+    ]
+    falha_gravacao = False
     try:
-        shutil.copy2(arquivo_escala, arquivo_escala_destino)
-        print(f"{Fore.GREEN}✓ Escala copiada para histórico{Style.RESET_ALL}")
-    except Exception as e:
-        print(f"{Fore.YELLOW}[AVISO] Aviso ao copiar escala: {e}{Style.RESET_ALL}")
+        for arquivo, future in futures_gravacao:
+            try:
+                future.result()
+            except Exception as e:
+                falha_gravacao = True
+                print(f"{Fore.RED}✗ Erro ao salvar relatório {arquivo}: {e}{Style.RESET_ALL}")
+    finally:
+        # Aguardar a cópia da escala iniciada logo após encontrar o arquivo
+        _aguardar_copia_escala(future_copia_escala)
+    
+    if falha_gravacao:
+        return
     
     print(f"\n{Fore.GREEN}{'='*60}{Style.RESET_ALL}")
     print(f"{Fore.GREEN}✓ RELATÓRIO CRIADO COM SUCESSO!{Style.RESET_ALL}")